@@ -1,11 +1,18 @@
 import streamlit as st
 import pandas as pd
-import json
+import numpy as np
+import pyarrow as pa
+from pyarrow import csv as pacsv
+import orjson
 import datetime
+import io
 import os
+import stat
+import tempfile
+import threading
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
 from datetime import timedelta
-import plotly.express as px
-import plotly.graph_objects as go
 from streamlit_option_menu import option_menu
 
 # Page configuration
@@ -44,56 +51,361 @@ st.markdown("""
 </style>
 """, unsafe_allow_html=True)
 
+DEPARTMENTS = ("Construction", "Management", "Administration", "Logistics")
+DEPT_INDEX = {dept: i for i, dept in enumerate(DEPARTMENTS)}
+
+# Fields of stored records, in the order they are displayed and exported
+EMPLOYEE_COLUMNS = ["employee_id", "name", "phone", "department", "position", "basic_salary",
+                    "overtime_applicable", "overtime_rate", "bank_account_number", "ifsc_code",
+                    "branch_name", "joining_date", "status"]
+ATTENDANCE_COLUMNS = ["employee_id", "date", "check_in", "overtime_hours", "notes", "recorded_at"]
+
+# Column types for bulk uploads, so pandas can skip type inference
+EMPLOYEE_UPLOAD_DTYPES = {
+    "employee_id": str,
+    "name": str,
+    "phone": str,
+    "department": str,
+    "position": str,
+    "basic_salary": float,
+    "overtime_rate": float,
+    "bank_account_number": str,
+    "ifsc_code": str,
+    "branch_name": str
+}
+
+ATTENDANCE_UPLOAD_DTYPES = {
+    "employee_id": str,
+    "date": str,
+    "check_in": str,
+    "overtime_hours": float,
+    "notes": str
+}
+
+
+def read_upload(uploaded_file, dtypes):
+    """Read an uploaded CSV or Excel file with fixed column types"""
+    if uploaded_file.name.endswith('.csv'):
+        return pd.read_csv(uploaded_file, dtype=dtypes, engine="c")
+    return pd.read_excel(uploaded_file, dtype=dtypes, engine="calamine")
+
 
 class PayrollSystem:
     def __init__(self):
         self.employees_file = "employees.json"
         self.attendance_file = "attendance.json"
+        # Append-only logs holding records added since the last snapshot
+        self.employees_log_file = "employees.jsonl"
+        self.attendance_log_file = "attendance.jsonl"
+        # Bumped on every change so derived frames and cached views know when to rebuild
+        self.employees_version = 0
+        self.attendance_version = 0
+        self._employees_frame = None
+        self._employees_frame_version = None
+        self._attendance_frame = None
+        self._attendance_frame_version = None
+        self._monthly_attendance = None
+        self._monthly_attendance_version = None
+        # Serialise changes and saves to each data file across sessions and the save_all workers
+        self._employees_lock = threading.RLock()
+        self._attendance_lock = threading.RLock()
         self.load_data()
+        self._open_logs()
+
+    def _open_logs(self):
+        """Open the append-only logs that new records are written to"""
+        self._employees_log = open(self.employees_log_file, 'ab', buffering=1 << 16)
+        self._attendance_log = open(self.attendance_log_file, 'ab', buffering=1 << 16)
 
     def load_data(self):
-        """Load employee and attendance data from JSON files"""
+        """Load employee and attendance data from JSON snapshots and replay their logs"""
         # Initialize files if they don't exist
         if not os.path.exists(self.employees_file):
-            with open(self.employees_file, 'w') as f:
-                json.dump({"employees": []}, f)
+            with open(self.employees_file, 'wb') as f:
+                f.write(orjson.dumps({"employees": []}))
 
         if not os.path.exists(self.attendance_file):
-            with open(self.attendance_file, 'w') as f:
-                json.dump({"attendance_records": []}, f)
+            with open(self.attendance_file, 'wb') as f:
+                f.write(orjson.dumps({"attendance_records": []}))
 
-        with open(self.employees_file, 'r') as f:
-            self.employees_data = json.load(f)
+        with open(self.employees_file, 'rb') as f:
+            self.employees_data = orjson.loads(f.read())
 
-        with open(self.attendance_file, 'r') as f:
-            self.attendance_data = json.load(f)
+        with open(self.attendance_file, 'rb') as f:
+            self.attendance_data = orjson.loads(f.read())
+
+        # Rotated logs numbered up to the snapshot's log_seq are already folded into it
+        self._log_seq = {
+            self.employees_log_file: self.employees_data.pop("log_seq", 0),
+            self.attendance_log_file: self.attendance_data.pop("log_seq", 0),
+        }
+        self.employees_data["employees"].extend(self._replay_logs(self.employees_log_file))
+        self.attendance_data["attendance_records"].extend(self._replay_logs(self.attendance_log_file))
+        self._build_employee_index()
+
+    def _build_employee_index(self):
+        """Map each employee ID to the position of its first record, and to its name"""
+        self._emp_index = {}
+        self._emp_name_by_id = {}
+        for i, emp in enumerate(self.employees_data["employees"]):
+            self._emp_index.setdefault(emp["employee_id"], i)
+            self._emp_name_by_id[emp["employee_id"]] = emp["name"]
+
+    def _replay_log(self, log_file):
+        """Read the records appended to a log since its snapshot was written"""
+        if not os.path.exists(log_file):
+            return []
+
+        with open(log_file, 'rb') as f:
+            data = f.read()
+
+        # A crash mid-append can leave a torn last line; cut it off so the next append starts on a fresh line
+        end = data.rfind(b"\n") + 1
+        if end < len(data):
+            with open(log_file, 'r+b') as f:
+                f.truncate(end)
+            data = data[:end]
+
+        return [orjson.loads(line) for line in data.splitlines() if line.strip()]
+
+    def _rotated_logs(self, log_file):
+        """List the logs moved aside by compaction as (sequence, path), oldest first"""
+        directory, name = os.path.split(log_file)
+        prefix = name + "."
+        rotated = []
+        for entry in os.listdir(directory or "."):
+            seq = entry[len(prefix):-len(".old")]
+            if entry.startswith(prefix) and entry.endswith(".old") and seq.isdigit():
+                rotated.append((int(seq), os.path.join(directory, entry)))
+        return sorted(rotated)
+
+    def _replay_logs(self, log_file):
+        """Read the records not yet in the snapshot from the rotated logs and then the live log"""
+        records = []
+        for seq, path in self._rotated_logs(log_file):
+            if seq <= self._log_seq[log_file]:
+                # Compaction was interrupted after the snapshot landed
+                os.remove(path)
+            else:
+                records.extend(self._replay_log(path))
+                self._log_seq[log_file] = seq
+        records.extend(self._replay_log(log_file))
+        return records
+
+    def _rotate_log(self, log, log_file):
+        """Move a log aside ahead of a snapshot and open a fresh one in its place"""
+        log.close()
+        self._log_seq[log_file] += 1
+        os.replace(log_file, f"{log_file}.{self._log_seq[log_file]}.old")
+        return open(log_file, 'ab', buffering=1 << 16)
+
+    def _write_snapshot(self, path, data, log_file):
+        """Atomically rewrite a snapshot file, then drop the rotated logs it now holds"""
+        seq = self._log_seq[log_file]
+        directory, name = os.path.split(path)
+        fd, tmp_path = tempfile.mkstemp(dir=directory or ".", prefix=os.path.splitext(name)[0] + ".",
+                                        suffix=".json.tmp")
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(orjson.dumps({**data, "log_seq": seq}))
+                f.flush()
+                os.fsync(f.fileno())
+            # mkstemp creates the file as 0600, so give it the permissions the snapshot already has
+            try:
+                mode = stat.S_IMODE(os.stat(path).st_mode)
+            except FileNotFoundError:
+                umask = os.umask(0)
+                os.umask(umask)
+                mode = 0o666 & ~umask
+            os.chmod(tmp_path, mode)
+            os.replace(tmp_path, path)
+        except BaseException:
+            os.remove(tmp_path)
+            raise
+
+        for rotated_seq, rotated_path in self._rotated_logs(log_file):
+            if rotated_seq <= seq:
+                os.remove(rotated_path)
+
+    def _append_log(self, log, records, snapshot_file, save):
+        """Append records to a log, compacting once the log outgrows its snapshot"""
+        log.write(b"".join(orjson.dumps(record) + b"\n" for record in records))
+        log.flush()
+
+        if log.tell() > os.path.getsize(snapshot_file):
+            save()
 
     def save_employees(self):
         """Save employee data to JSON file"""
-        with open(self.employees_file, 'w') as f:
-            json.dump(self.employees_data, f, indent=2)
+        with self._employees_lock:
+            self._employees_log = self._rotate_log(self._employees_log, self.employees_log_file)
+            self._write_snapshot(self.employees_file, self.employees_data, self.employees_log_file)
 
     def save_attendance(self):
         """Save attendance data to JSON file"""
-        with open(self.attendance_file, 'w') as f:
-            json.dump(self.attendance_data, f, indent=2)
+        with self._attendance_lock:
+            self._attendance_log = self._rotate_log(self._attendance_log, self.attendance_log_file)
+            self._write_snapshot(self.attendance_file, self.attendance_data, self.attendance_log_file)
+
+    def save_all(self):
+        """Save employee and attendance data, writing and syncing both files concurrently"""
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            list(executor.map(lambda save: save(), [self.save_employees, self.save_attendance]))
+
+    def compact(self):
+        """Fold both logs into their snapshots"""
+        self.save_all()
+
+    def reload(self):
+        """Re-read both data files from disk in place, so every session sees the reloaded data"""
+        with self._employees_lock, self._attendance_lock:
+            self._employees_log.close()
+            self._attendance_log.close()
+            self.load_data()
+            self._open_logs()
+            self.employees_version += 1
+            self.attendance_version += 1
+
+    def clear_all_data(self):
+        """Delete all employees and attendance records"""
+        with self._employees_lock, self._attendance_lock:
+            self.employees_data["employees"].clear()
+            self.attendance_data["attendance_records"].clear()
+            self.employees_version += 1
+            self.attendance_version += 1
+            self._emp_index = {}
+            self._emp_name_by_id = {}
+        self.save_all()
 
     def add_employee(self, employee_data):
         """Add a new employee to the system"""
-        self.employees_data["employees"].append(employee_data)
-        self.save_employees()
+        self.add_employees([employee_data])
+
+    def add_employees(self, employees):
+        """Add several employees to the system with a single log write"""
+        with self._employees_lock:
+            start = len(self.employees_data["employees"])
+            self.employees_data["employees"].extend(employees)
+            for i, emp in enumerate(employees, start):
+                self._emp_index.setdefault(emp["employee_id"], i)
+                self._emp_name_by_id[emp["employee_id"]] = emp["name"]
+            self.employees_version += 1
+            self._append_log(self._employees_log, employees, self.employees_file, self.save_employees)
+
+    def update_employee(self, employee_id, changes):
+        """Update an existing employee's details"""
+        with self._employees_lock:
+            self.get_employee(employee_id).update(changes)
+            if "name" in changes:
+                self._emp_name_by_id[employee_id] = changes["name"]
+            self.employees_version += 1
+            self.save_employees()
+
+    def employee_names(self):
+        """Get the employee ID -> name mapping"""
+        return self._emp_name_by_id
 
     def get_employee(self, employee_id):
         """Get employee by ID"""
-        for emp in self.employees_data["employees"]:
-            if emp["employee_id"] == employee_id:
-                return emp
-        return None
+        i = self._emp_index.get(employee_id)
+        return self.employees_data["employees"][i] if i is not None else None
 
     def record_attendance(self, attendance_data):
         """Record attendance for an employee"""
-        self.attendance_data["attendance_records"].append(attendance_data)
-        self.save_attendance()
+        self.record_attendance_batch([attendance_data])
+
+    def record_attendance_batch(self, attendance_records):
+        """Record several attendance entries with a single log write"""
+        with self._attendance_lock:
+            self.attendance_data["attendance_records"].extend(attendance_records)
+            self.attendance_version += 1
+            self._append_log(self._attendance_log, attendance_records, self.attendance_file, self.save_attendance)
+
+    def employees_frame(self):
+        """Get employees as a DataFrame, rebuilt only after changes"""
+        # Read the version before building, so a change made by another session mid-build forces a rebuild
+        version = self.employees_version
+        if self._employees_frame_version != version:
+            self._employees_frame = pd.DataFrame.from_records(self.employees_data["employees"],
+                                                              columns=EMPLOYEE_COLUMNS)
+            self._employees_frame_version = version
+
+        return self._employees_frame
+
+    def attendance_frame(self):
+        """Get attendance records as a DataFrame with parsed dates, rebuilt only after changes"""
+        version = self.attendance_version
+        if self._attendance_frame_version != version:
+            df = pd.DataFrame.from_records(self.attendance_data["attendance_records"], columns=ATTENDANCE_COLUMNS)
+            df["overtime_hours"] = df["overtime_hours"].fillna(0)
+            # Keep the dates as recorded for display and export; "date" holds the parsed values
+            df["raw_date"] = df["date"]
+            df["date"] = pd.to_datetime(df["raw_date"], format="ISO8601", errors="coerce")
+
+            self._attendance_frame = df
+            self._attendance_frame_version = version
+
+        return self._attendance_frame
+
+    def monthly_attendance(self, month, year):
+        """Get the attendance records that fall in a specific month"""
+        attendance_df = self.attendance_frame()
+        dates = attendance_df["date"].dt
+        return attendance_df[(dates.year == year) & (dates.month == month)]
+
+    def monthly_attendance_totals(self):
+        """Get working days and overtime hours per (employee ID, year, month), rebuilt only after changes"""
+        version = self.attendance_version
+        if self._monthly_attendance_version != version:
+            # Group on the parsed dates so every salary path agrees on which month a record falls in
+            attendance_df = self.attendance_frame()
+            dates = attendance_df["date"].dt
+            totals = attendance_df.groupby(["employee_id", dates.year, dates.month])["overtime_hours"].agg(
+                ["size", "sum"])
+
+            self._monthly_attendance = {key: (int(days), float(hours))
+                                        for key, days, hours in zip(totals.index, totals["size"], totals["sum"])}
+            self._monthly_attendance_version = version
+
+        return self._monthly_attendance
+
+    def calculate_all_salaries(self, month, year):
+        """Calculate salaries for all active employees for a specific month in one pass"""
+        employees_df = self.employees_frame()
+        salaries = employees_df.loc[employees_df["status"] == "active",
+                                    ["employee_id", "name", "basic_salary", "overtime_applicable", "overtime_rate"]]
+
+        # Working days and overtime hours per employee for the specified month
+        monthly_records = self.monthly_attendance(month, year)
+        totals = monthly_records.groupby("employee_id")["overtime_hours"].agg(["size", "sum"])
+        salaries = salaries.join(totals, on="employee_id")
+
+        overtime_applicable = salaries["overtime_applicable"].fillna(False).astype(bool)
+        salaries["working_days"] = salaries["size"].fillna(0).astype(int)
+        salaries["total_overtime_hours"] = salaries["sum"].fillna(0).where(overtime_applicable, 0)
+
+        # Basic salary is pro-rated over a 30 day month, as in calculate_salary
+        salaries["basic_salary"] = salaries["basic_salary"] / 30 * salaries["working_days"]
+        salaries["overtime_pay"] = salaries["total_overtime_hours"] * salaries["overtime_rate"].fillna(0)
+        salaries["gross_salary"] = salaries["basic_salary"] + salaries["overtime_pay"]
+        salaries["net_salary"] = salaries["gross_salary"]
+
+        return salaries[["employee_id", "name", "working_days", "total_overtime_hours", "basic_salary",
+                         "overtime_pay", "gross_salary", "net_salary"]]
+
+    def monthly_payroll_total(self, month, year):
+        """Calculate the total net payroll of active employees for a specific month in one pass"""
+        employees_df = self.employees_frame()
+        active_employees = employees_df.loc[employees_df["status"] == "active",
+                                            ["employee_id", "basic_salary", "overtime_applicable", "overtime_rate"]]
+
+        # Every attendance record adds one day of pay plus its overtime, so there is no need to group by employee
+        records = self.monthly_attendance(month, year)[["employee_id", "overtime_hours"]].merge(
+            active_employees, on="employee_id")
+        overtime_applicable = records["overtime_applicable"].fillna(False).astype(bool)
+        overtime_rate = records["overtime_rate"].fillna(0).where(overtime_applicable, 0)
+
+        return float((records["basic_salary"] / 30 + records["overtime_hours"] * overtime_rate).sum())
 
     def calculate_salary(self, employee_id, month, year):
         """Calculate salary for an employee for a specific month"""
@@ -101,15 +413,9 @@ class PayrollSystem:
         if not employee:
             return None
 
-        # Filter attendance records for the specified month
-        monthly_records = [
-            record for record in self.attendance_data["attendance_records"]
-            if (record["employee_id"] == employee_id and
-                record["date"].startswith(f"{year}-{month:02d}"))
-        ]
-
-        # Calculate working days
-        working_days = len(monthly_records)
+        # Look up attendance totals for the specified month
+        month_key = (employee_id, year, month)
+        working_days, monthly_overtime_hours = self.monthly_attendance_totals().get(month_key, (0, 0.0))
 
         # Calculate basic salary (pro-rated for working days)
         daily_rate = employee["basic_salary"] / 30  # Assuming 30 days in month
@@ -120,7 +426,7 @@ class PayrollSystem:
         total_overtime_hours = 0
 
         if employee.get("overtime_applicable", False):
-            total_overtime_hours = sum(record.get("overtime_hours", 0) for record in monthly_records)
+            total_overtime_hours = monthly_overtime_hours
             overtime_pay = total_overtime_hours * employee["overtime_rate"]
 
         # Calculate gross salary
@@ -142,11 +448,195 @@ class PayrollSystem:
         }
 
 
+@st.cache_resource
+def get_payroll():
+    """Get the payroll system, kept in memory across reruns"""
+    return PayrollSystem()
+
+
+@st.cache_data
+def employees_view_df(_payroll, employees_version):
+    """Build the Employee List table, cached until the employees change"""
+    employees_df = _payroll.employees_frame()
+    overtime_applicable = employees_df["overtime_applicable"]
+
+    return pd.DataFrame({
+        "Employee ID": employees_df["employee_id"],
+        "Name": employees_df["name"],
+        "Phone": employees_df["phone"],
+        "Department": employees_df["department"],
+        "Position": employees_df["position"],
+        "Basic Salary": employees_df["basic_salary"].map("₹{:,.2f}".format),
+        "Overtime Applicable": np.where(overtime_applicable.fillna(False).astype(bool), "Yes", "No"),
+        "Status": employees_df["status"]
+    })
+
+
+@st.cache_data
+def attendance_view_df(_payroll, employees_version, attendance_version):
+    """Build the Attendance Records table, cached until employees or attendance change"""
+    # Start from the typed attendance frame, but show and export dates exactly as recorded;
+    # the parsed dates are only for filtering and aggregation
+    frame = _payroll.attendance_frame()
+    attendance_df = frame[ATTENDANCE_COLUMNS]
+    attendance_df["date"] = frame["raw_date"]
+
+    # Add employee names for better readability
+    # Store names as a categorical so each row holds a small code instead of its own string
+    employee_ids = pd.Categorical(attendance_df["employee_id"])
+    names = employee_ids.categories.map(_payroll.employee_names())
+    name_categories = names.dropna().unique()
+    # The trailing -1 keeps rows with a missing ID (code -1) missing
+    name_codes = np.append(name_categories.get_indexer(names), -1)
+    attendance_df["employee_name"] = pd.Categorical.from_codes(name_codes[employee_ids.codes],
+                                                               categories=name_categories)
+
+    # Reorder columns
+    cols = ["employee_id", "employee_name", "date", "check_in", "overtime_hours", "notes", "recorded_at"]
+    return attendance_df[cols]
+
+
+@st.cache_data
+def employee_select_options(_payroll, employees_version, active_only=False):
+    """Build "ID - Name" select options, cached until the employees change"""
+    return [f"{emp['employee_id']} - {emp['name']}" for emp in _payroll.employees_data["employees"]
+            if not active_only or emp["status"] == "active"]
+
+
+@st.cache_data
+def department_pie_chart(_payroll, employees_version):
+    """Build the department distribution pie chart, cached until the employees change"""
+    import plotly.express as px
+
+    departments = _payroll.employees_frame()["department"].value_counts()
+    return px.pie(
+        values=departments.values,
+        names=departments.index,
+        title="Employee Distribution by Department"
+    )
+
+
+@st.cache_data
+def salary_histogram(_payroll, employees_version):
+    """Build the basic salary histogram, cached until the employees change"""
+    import plotly.express as px
+
+    return px.histogram(
+        x=_payroll.employees_frame()["basic_salary"].to_numpy(),
+        title="Salary Distribution",
+        labels={"x": "Basic Salary (₹)", "y": "Count"}
+    )
+
+
+@st.cache_data
+def attendance_trend_chart(_payroll, attendance_version):
+    """Build the monthly attendance trend chart, cached until attendance changes"""
+    import plotly.express as px
+
+    attendance_df = _payroll.attendance_frame()
+    months = attendance_df["date"].dt.to_period('M').rename('month')
+
+    monthly_attendance = attendance_df.groupby(months).size().reset_index(name='count')
+    monthly_attendance['month'] = monthly_attendance['month'].astype(str)
+
+    return px.line(monthly_attendance, x='month', y='count',
+                   title="Monthly Attendance Trend")
+
+
+@st.cache_data
+def department_salary_chart(_payroll, employees_version):
+    """Build the department-wise salary box plot, cached until the employees change"""
+    import plotly.graph_objects as go
+
+    fig = go.Figure()
+    for dept, salaries in _payroll.employees_frame().groupby("department", sort=False)["basic_salary"]:
+        fig.add_trace(go.Box(y=salaries.to_numpy(), name=dept))
+
+    fig.update_layout(
+        title="Salary Distribution by Department",
+        yaxis_title="Basic Salary (₹)"
+    )
+    return fig
+
+
+@st.cache_data
+def status_pie_chart(_payroll, employees_version):
+    """Build the employee status pie chart, cached until the employees change"""
+    import plotly.express as px
+
+    status_count = _payroll.employees_frame()["status"].value_counts()
+    return px.pie(values=status_count.values,
+                  names=status_count.index,
+                  title="Employee Status Distribution")
+
+
+def export_column(values):
+    """Convert one export column to Arrow, falling back to strings when it holds mixed types"""
+    try:
+        return pa.array(values)
+    except pa.ArrowException:
+        # Hand-edited data can mix types in a column; stringify just that column so the
+        # rest of the export keeps Arrow's formatting
+        return pa.array([None if value is None else str(value) for value in values], type=pa.string())
+
+
+def records_to_csv(records, columns):
+    """Write records as CSV bytes with Arrow's CSV writer, in a fixed column order"""
+    table = pa.Table.from_arrays([export_column([record.get(col) for record in records]) for col in columns],
+                                 names=columns)
+    sink = pa.BufferOutputStream()
+    pacsv.write_csv(table, sink)
+    return sink.getvalue().to_pybytes()
+
+
+@st.cache_resource
+def export_worker():
+    """Get the background worker that builds the data export, shared across sessions"""
+    return {"executor": ThreadPoolExecutor(max_workers=1), "jobs": {}}
+
+
+def zip_exports(employees_job, attendance_job):
+    """Bundle both export CSVs into one ZIP archive"""
+    buf = io.BytesIO()
+    with zipfile.ZipFile(buf, "w", zipfile.ZIP_DEFLATED, compresslevel=6) as z:
+        z.writestr("employees_export.csv", employees_job.result())
+        z.writestr("attendance_export.csv", attendance_job.result())
+    return buf.getvalue()
+
+
+def refresh_exports(payroll):
+    """Start rebuilding any part of the export whose data changed since it was last built"""
+    worker = export_worker()
+    sources = {
+        "employees": (payroll.employees_version, payroll.employees_data["employees"], EMPLOYEE_COLUMNS),
+        "attendance": (payroll.attendance_version, payroll.attendance_data["attendance_records"],
+                       ATTENDANCE_COLUMNS)
+    }
+
+    for name, (version, records, columns) in sources.items():
+        job = worker["jobs"].get(name)
+        if job is None or job[0] != version:
+            # Hand the worker a copy of the list so later appends don't race with the export
+            worker["jobs"][name] = (version, worker["executor"].submit(records_to_csv, list(records), columns))
+
+    # The worker runs jobs in order, so both CSVs are finished by the time the ZIP job starts
+    versions = (payroll.employees_version, payroll.attendance_version)
+    job = worker["jobs"].get("zip")
+    if job is None or job[0] != versions:
+        worker["jobs"]["zip"] = (versions, worker["executor"].submit(
+            zip_exports, worker["jobs"]["employees"][1], worker["jobs"]["attendance"][1]))
+
+
+def export_data():
+    """Get the latest export ZIP bytes, waiting for the worker if it is still building them"""
+    return export_worker()["jobs"]["zip"][1].result()
+
+
 def main():
     st.markdown('<div class="main-header">🏗️ Sagittal Payroll Management System</div>', unsafe_allow_html=True)
 
     # Initialize payroll system
-    payroll = PayrollSystem()
+    payroll = get_payroll()
 
     # Sidebar navigation
     with st.sidebar:
@@ -164,15 +654,15 @@ def main():
 
     # Employee Management
     elif selected == "Employee Management":
-        display_employee_management(payroll)
+        display_employee_management()
 
     # Attendance
     elif selected == "Attendance":
-        display_attendance(payroll)
+        display_attendance()
 
     # Salary Processing
     elif selected == "Salary Processing":
-        display_salary_processing(payroll)
+        display_salary_processing()
 
     # Reports
     elif selected == "Reports":
@@ -180,7 +670,7 @@ def main():
 
     # Settings
     elif selected == "Settings":
-        display_settings(payroll)
+        display_settings()
 
 
 def display_dashboard(payroll):
@@ -189,8 +679,9 @@ def display_dashboard(payroll):
     # Key metrics
     col1, col2, col3, col4 = st.columns(4)
 
-    total_employees = len(payroll.employees_data["employees"])
-    active_employees = len([emp for emp in payroll.employees_data["employees"] if emp["status"] == "active"])
+    employees_df = payroll.employees_frame()
+    total_employees = len(employees_df)
+    active_employees = int(employees_df["status"].eq("active").sum())
 
     with col1:
         st.metric("Total Employees", total_employees)
@@ -200,15 +691,9 @@ def display_dashboard(payroll):
 
     with col3:
         # Calculate total payroll for current month
-        current_month = datetime.datetime.now().month
-        current_year = datetime.datetime.now().year
-        total_payroll = 0
-
-        for emp in payroll.employees_data["employees"]:
-            if emp["status"] == "active":
-                salary_data = payroll.calculate_salary(emp["employee_id"], current_month, current_year)
-                if salary_data:
-                    total_payroll += salary_data["net_salary"]
+        now = datetime.datetime.now()
+        current_month, current_year = now.month, now.year
+        total_payroll = payroll.monthly_payroll_total(current_month, current_year)
 
         st.metric("Monthly Payroll", f"₹{total_payroll:,.2f}")
 
@@ -225,32 +710,19 @@ def display_dashboard(payroll):
 
     with col1:
         # Department distribution
-        departments = {}
-        for emp in payroll.employees_data["employees"]:
-            dept = emp["department"]
-            departments[dept] = departments.get(dept, 0) + 1
-
-        if departments:
-            fig = px.pie(
-                values=list(departments.values()),
-                names=list(departments.keys()),
-                title="Employee Distribution by Department"
-            )
-            st.plotly_chart(fig)
+        if not employees_df.empty:
+            st.plotly_chart(department_pie_chart(payroll, payroll.employees_version))
 
     with col2:
         # Salary distribution
-        if payroll.employees_data["employees"]:
-            salaries = [emp["basic_salary"] for emp in payroll.employees_data["employees"]]
-            fig = px.histogram(
-                x=salaries,
-                title="Salary Distribution",
-                labels={"x": "Basic Salary (₹)", "y": "Count"}
-            )
-            st.plotly_chart(fig)
+        if not employees_df.empty:
+            st.plotly_chart(salary_histogram(payroll, payroll.employees_version))
 
 
-def display_employee_management(payroll):
+@st.fragment
+def display_employee_management():
+    # Fragment reruns replay the original arguments, so fetch the shared system on each run
+    payroll = get_payroll()
     st.header("👥 Employee Management")
 
     tab1, tab2, tab3, tab4 = st.tabs(["Add Employee", "View Employees", "Edit Employee", "Bulk Upload"])
@@ -265,7 +737,7 @@ def display_employee_management(payroll):
                 employee_id = st.text_input("Employee ID*")
                 name = st.text_input("Full Name*")
                 phone = st.text_input("Phone*")
-                department = st.selectbox("Department*", ["Construction", "Management", "Administration", "Logistics"])
+                department = st.selectbox("Department*", DEPARTMENTS)
 
             with col2:
                 position = st.text_input("Position*")
@@ -319,20 +791,7 @@ def display_employee_management(payroll):
 
         if payroll.employees_data["employees"]:
             # Create a simplified dataframe for display
-            display_data = []
-            for emp in payroll.employees_data["employees"]:
-                display_data.append({
-                    "Employee ID": emp["employee_id"],
-                    "Name": emp["name"],
-                    "Phone": emp["phone"],
-                    "Department": emp["department"],
-                    "Position": emp["position"],
-                    "Basic Salary": f"₹{emp['basic_salary']:,.2f}",
-                    "Overtime Applicable": "Yes" if emp.get("overtime_applicable", False) else "No",
-                    "Status": emp["status"]
-                })
-
-            employees_df = pd.DataFrame(display_data)
+            employees_df = employees_view_df(payroll, payroll.employees_version)
             st.dataframe(employees_df, use_container_width=True)
         else:
             st.info("No employees found. Add some employees to get started.")
@@ -340,7 +799,7 @@ def display_employee_management(payroll):
     with tab3:
         st.subheader("Edit Employee")
 
-        employee_options = [f"{emp['employee_id']} - {emp['name']}" for emp in payroll.employees_data["employees"]]
+        employee_options = employee_select_options(payroll, payroll.employees_version)
 
         if employee_options:
             selected_employee = st.selectbox("Select Employee", employee_options)
@@ -355,10 +814,8 @@ def display_employee_management(payroll):
                     with col1:
                         name = st.text_input("Full Name", value=employee["name"])
                         phone = st.text_input("Phone", value=employee["phone"])
-                        department = st.selectbox("Department",
-                                                  ["Construction", "Management", "Administration", "Logistics"],
-                                                  index=["Construction", "Management", "Administration",
-                                                         "Logistics"].index(employee["department"]))
+                        department = st.selectbox("Department", DEPARTMENTS,
+                                                  index=DEPT_INDEX[employee["department"]])
 
                     with col2:
                         position = st.text_input("Position", value=employee["position"])
@@ -389,7 +846,7 @@ def display_employee_management(payroll):
 
                     if submitted:
                         # Update employee data
-                        employee.update({
+                        payroll.update_employee(employee_id, {
                             "name": name,
                             "phone": phone,
                             "department": department,
@@ -403,7 +860,6 @@ def display_employee_management(payroll):
                             "status": status
                         })
 
-                        payroll.save_employees()
                         st.success(f"Employee {name} updated successfully!")
 
     with tab4:
@@ -413,10 +869,7 @@ def display_employee_management(payroll):
 
         if uploaded_file is not None:
             try:
-                if uploaded_file.name.endswith('.csv'):
-                    df = pd.read_csv(uploaded_file)
-                else:
-                    df = pd.read_excel(uploaded_file)
+                df = read_upload(uploaded_file, EMPLOYEE_UPLOAD_DTYPES)
 
                 st.write("Preview of uploaded data:")
                 st.dataframe(df.head())
@@ -430,28 +883,21 @@ def display_employee_management(payroll):
                     st.error(f"Missing required columns: {', '.join(missing_columns)}")
                 else:
                     if st.button("Process Employee Upload"):
-                        records_processed = 0
-                        for _, row in df.iterrows():
-                            employee_data = {
-                                "employee_id": str(row['employee_id']),
-                                "name": str(row['name']),
-                                "phone": str(row['phone']),
-                                "department": str(row['department']),
-                                "position": str(row['position']),
-                                "basic_salary": float(row['basic_salary']),
-                                "overtime_applicable": bool(row.get('overtime_applicable', False)),
-                                "overtime_rate": float(row.get('overtime_rate', 0.0)),
-                                "bank_account_number": str(row['bank_account_number']),
-                                "ifsc_code": str(row['ifsc_code']),
-                                "branch_name": str(row['branch_name']),
-                                "joining_date": str(datetime.datetime.now().date()),
-                                "status": "active"
-                            }
-
-                            payroll.add_employee(employee_data)
-                            records_processed += 1
-
-                        st.success(f"Successfully processed {records_processed} employee records!")
+                        text_columns = [col for col in required_columns if col != 'basic_salary']
+                        employees_df = df.assign(
+                            overtime_applicable=df.get('overtime_applicable', False),
+                            overtime_rate=df.get('overtime_rate', 0.0)
+                        )
+                        employees_df[text_columns] = employees_df[text_columns].fillna('').astype(str)
+                        employees_df['basic_salary'] = employees_df['basic_salary'].astype(float)
+                        employees_df['overtime_applicable'] = employees_df['overtime_applicable'].fillna(False).astype(bool)
+                        employees_df['overtime_rate'] = employees_df['overtime_rate'].astype(float).fillna(0.0)
+                        employees_df['joining_date'] = str(datetime.datetime.now().date())
+                        employees_df['status'] = "active"
+
+                        payroll.add_employees(employees_df[EMPLOYEE_COLUMNS].to_dict('records'))
+
+                        st.success(f"Successfully processed {len(employees_df)} employee records!")
 
             except Exception as e:
                 st.error(f"Error processing file: {str(e)}")
@@ -464,7 +910,9 @@ def display_employee_management(payroll):
         """)
 
 
-def display_attendance(payroll):
+@st.fragment
+def display_attendance():
+    payroll = get_payroll()
     st.header("📅 Attendance Management")
 
     tab1, tab2, tab3 = st.tabs(["Manual Entry", "Bulk Upload", "View Records"])
@@ -476,8 +924,7 @@ def display_attendance(payroll):
             col1, col2 = st.columns(2)
 
             with col1:
-                employee_options = [f"{emp['employee_id']} - {emp['name']}" for emp in
-                                    payroll.employees_data["employees"] if emp["status"] == "active"]
+                employee_options = employee_select_options(payroll, payroll.employees_version, active_only=True)
                 selected_employee = st.selectbox("Select Employee*", employee_options)
                 employee_id = selected_employee.split(" - ")[0] if selected_employee else ""
 
@@ -522,30 +969,23 @@ def display_attendance(payroll):
 
         if uploaded_file is not None:
             try:
-                if uploaded_file.name.endswith('.csv'):
-                    df = pd.read_csv(uploaded_file)
-                else:
-                    df = pd.read_excel(uploaded_file)
+                df = read_upload(uploaded_file, ATTENDANCE_UPLOAD_DTYPES)
 
                 st.write("Preview of uploaded data:")
                 st.dataframe(df.head())
 
                 if st.button("Process Upload"):
-                    records_processed = 0
-                    for _, row in df.iterrows():
-                        attendance_data = {
-                            "employee_id": str(row.get('employee_id', '')),
-                            "date": str(row.get('date', '')),
-                            "check_in": str(row.get('check_in', '09:00')),
-                            "overtime_hours": float(row.get('overtime_hours', 0)),
-                            "notes": str(row.get('notes', '')),
-                            "recorded_at": str(datetime.datetime.now())
-                        }
-
-                        payroll.record_attendance(attendance_data)
-                        records_processed += 1
-
-                    st.success(f"Successfully processed {records_processed} attendance records!")
+                    defaults = {'employee_id': '', 'date': '', 'check_in': '09:00', 'notes': ''}
+                    attendance_df = df.assign(**{col: df.get(col, default) for col, default in defaults.items()})
+                    attendance_df = attendance_df.assign(overtime_hours=df.get('overtime_hours', 0))
+                    # Blank cells get the same per-column defaults as missing columns
+                    attendance_df[list(defaults)] = attendance_df[list(defaults)].fillna(defaults).astype(str)
+                    attendance_df['overtime_hours'] = attendance_df['overtime_hours'].astype(float).fillna(0.0)
+                    attendance_df['recorded_at'] = str(datetime.datetime.now())
+
+                    payroll.record_attendance_batch(attendance_df[ATTENDANCE_COLUMNS].to_dict('records'))
+
+                    st.success(f"Successfully processed {len(attendance_df)} attendance records!")
 
             except Exception as e:
                 st.error(f"Error processing file: {str(e)}")
@@ -561,23 +1001,17 @@ def display_attendance(payroll):
 
         if payroll.attendance_data["attendance_records"]:
             # Convert to DataFrame for better display
-            attendance_df = pd.DataFrame(payroll.attendance_data["attendance_records"])
-
-            # Add employee names for better readability
-            employee_map = {emp["employee_id"]: emp["name"] for emp in payroll.employees_data["employees"]}
-            attendance_df["employee_name"] = attendance_df["employee_id"].map(employee_map)
-
-            # Reorder columns
-            cols = ["employee_id", "employee_name", "date", "check_in", "overtime_hours", "notes", "recorded_at"]
-            attendance_df = attendance_df[cols]
+            attendance_df = attendance_view_df(payroll, payroll.employees_version, payroll.attendance_version)
 
             st.dataframe(attendance_df, use_container_width=True)
 
-            # Export option
-            csv = attendance_df.to_csv(index=False)
+            # Export option, written straight to a bytes buffer
+            csv_buf = io.BytesIO()
+            attendance_df.to_csv(csv_buf, index=False)
+            csv_buf.seek(0)
             st.download_button(
                 label="Export as CSV",
-                data=csv,
+                data=csv_buf,
                 file_name="attendance_records.csv",
                 mime="text/csv"
             )
@@ -585,7 +1019,9 @@ def display_attendance(payroll):
             st.info("No attendance records found.")
 
 
-def display_salary_processing(payroll):
+@st.fragment
+def display_salary_processing():
+    payroll = get_payroll()
     st.header("💰 Salary Processing")
 
     col1, col2 = st.columns(2)
@@ -599,33 +1035,26 @@ def display_salary_processing(payroll):
         year = st.selectbox("Select Year", range(current_year - 1, current_year + 2), index=1)
 
     if st.button("Calculate Salaries"):
-        salary_results = []
-
-        for emp in payroll.employees_data["employees"]:
-            if emp["status"] == "active":
-                salary_data = payroll.calculate_salary(emp["employee_id"], month, year)
-                if salary_data:
-                    salary_results.append({
-                        "Employee ID": emp["employee_id"],
-                        "Name": emp["name"],
-                        "Working Days": salary_data["working_days"],
-                        "Overtime Hours": salary_data["total_overtime_hours"],
-                        "Basic Salary": f"₹{salary_data['basic_salary']:,.2f}",
-                        "Overtime Pay": f"₹{salary_data['overtime_pay']:,.2f}",
-                        "Gross Salary": f"₹{salary_data['gross_salary']:,.2f}",
-                        "Net Salary": f"₹{salary_data['net_salary']:,.2f}"
-                    })
-
-        if salary_results:
-            salary_df = pd.DataFrame(salary_results)
+        salaries = payroll.calculate_all_salaries(month, year)
+
+        if not salaries.empty:
+            salary_df = pd.DataFrame({
+                "Employee ID": salaries["employee_id"],
+                "Name": salaries["name"],
+                "Working Days": salaries["working_days"],
+                "Overtime Hours": salaries["total_overtime_hours"],
+                "Basic Salary": salaries["basic_salary"].map("₹{:,.2f}".format),
+                "Overtime Pay": salaries["overtime_pay"].map("₹{:,.2f}".format),
+                "Gross Salary": salaries["gross_salary"].map("₹{:,.2f}".format),
+                "Net Salary": salaries["net_salary"].map("₹{:,.2f}".format)
+            })
             st.dataframe(salary_df, use_container_width=True)
 
             # Generate salary slips
             st.subheader("Generate Salary Slips")
 
             selected_employee = st.selectbox("Select Employee for Salary Slip",
-                                             [f"{emp['employee_id']} - {emp['name']}" for emp in
-                                              payroll.employees_data["employees"]])
+                                             employee_select_options(payroll, payroll.employees_version))
 
             if selected_employee:
                 employee_id = selected_employee.split(" - ")[0]
@@ -698,16 +1127,7 @@ def display_reports(payroll):
 
         if payroll.attendance_data["attendance_records"]:
             # Monthly attendance trend
-            attendance_df = pd.DataFrame(payroll.attendance_data["attendance_records"])
-            attendance_df['date'] = pd.to_datetime(attendance_df['date'])
-            attendance_df['month'] = attendance_df['date'].dt.to_period('M')
-
-            monthly_attendance = attendance_df.groupby('month').size().reset_index(name='count')
-            monthly_attendance['month'] = monthly_attendance['month'].astype(str)
-
-            fig = px.line(monthly_attendance, x='month', y='count',
-                          title="Monthly Attendance Trend")
-            st.plotly_chart(fig)
+            st.plotly_chart(attendance_trend_chart(payroll, payroll.attendance_version))
         else:
             st.info("No attendance data available for reports.")
 
@@ -716,75 +1136,66 @@ def display_reports(payroll):
 
         if payroll.employees_data["employees"]:
             # Department-wise salary distribution
-            dept_salaries = {}
-            for emp in payroll.employees_data["employees"]:
-                dept = emp["department"]
-                if dept not in dept_salaries:
-                    dept_salaries[dept] = []
-                dept_salaries[dept].append(emp["basic_salary"])
-
-            fig = go.Figure()
-            for dept, salaries in dept_salaries.items():
-                fig.add_trace(go.Box(y=salaries, name=dept))
-
-            fig.update_layout(
-                title="Salary Distribution by Department",
-                yaxis_title="Basic Salary (₹)"
-            )
-            st.plotly_chart(fig)
+            st.plotly_chart(department_salary_chart(payroll, payroll.employees_version))
 
     with tab3:
         st.subheader("Employee Statistics")
 
         if payroll.employees_data["employees"]:
             # Employee status distribution
-            status_count = {}
-            for emp in payroll.employees_data["employees"]:
-                status = emp["status"]
-                status_count[status] = status_count.get(status, 0) + 1
-
-            fig = px.pie(values=list(status_count.values()),
-                         names=list(status_count.keys()),
-                         title="Employee Status Distribution")
-            st.plotly_chart(fig)
+            st.plotly_chart(status_pie_chart(payroll, payroll.employees_version))
 
 
-def display_settings(payroll):
+@st.fragment
+def display_settings():
+    # Runs as a fragment so its buttons only rerun this page, not the whole app
+    payroll = get_payroll()
     st.header("⚙️ System Settings")
 
+    # Build the export CSVs in the background so they are ready before Export is clicked
+    refresh_exports(payroll)
+
     st.subheader("Data Management")
 
     col1, col2 = st.columns(2)
 
     with col1:
         if st.button("Export All Data"):
-            # Export employees data
-            employees_csv = pd.DataFrame(payroll.employees_data["employees"]).to_csv(index=False)
-            st.download_button(
-                label="Download Employees CSV",
-                data=employees_csv,
-                file_name="employees_export.csv",
-                mime="text/csv"
-            )
+            st.session_state["exports_ready"] = True
 
-            # Export attendance data
-            attendance_csv = pd.DataFrame(payroll.attendance_data["attendance_records"]).to_csv(index=False)
+        # Keep the downloads on screen across the reruns the download buttons trigger
+        if st.session_state.get("exports_ready"):
+            # Export employees and attendance data as one archive
             st.download_button(
-                label="Download Attendance CSV",
-                data=attendance_csv,
-                file_name="attendance_export.csv",
-                mime="text/csv"
+                label="Download export.zip",
+                data=export_data(),
+                file_name="export.zip",
+                mime="application/zip"
             )
 
+        if st.button("Compact Data Files"):
+            payroll.compact()
+            st.success("Data files compacted successfully!")
+
+        if st.button("Reload from Disk"):
+            # Reload the shared system in place; the version bump refreshes every cached view and export
+            payroll.reload()
+            st.rerun()
+
     with col2:
         st.warning("Danger Zone")
-        if st.button("Clear All Data"):
-            if st.checkbox("I understand this will delete all data permanently"):
-                payroll.employees_data["employees"] = []
-                payroll.attendance_data["attendance_records"] = []
-                payroll.save_employees()
-                payroll.save_attendance()
-                st.success("All data cleared successfully!")
+        confirm_clear = st.checkbox("I understand this will delete all data permanently", key="confirm_clear")
+
+        def clear_all_data():
+            get_payroll().clear_all_data()
+            # Untick the confirmation so the next clear has to be confirmed again
+            st.session_state["confirm_clear"] = False
+            st.session_state["data_cleared"] = True
+
+        st.button("Clear All Data", disabled=not confirm_clear, on_click=clear_all_data)
+        # The button is disabled again by the time the page reruns, so report the clear from session state
+        if st.session_state.pop("data_cleared", False):
+            st.success("All data cleared successfully!")
 
     st.subheader("System Information")
     st.write(f"**Total Employees:** {len(payroll.employees_data['employees'])}")